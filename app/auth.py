@@ -12,7 +12,7 @@ def _sha256_hex(b: bytes) -> str:
     return hashlib.sha256(b).hexdigest()
 
 def verify_signed_request(db: Session, headers: dict, method: str, path: str, body_bytes: bytes,
-                           max_skew: int, nonce_ttl: int):
+                           max_skew: int, nonce_ttl: int, record_nonce: bool = True):
     key_id = headers.get("x-key-id")
     ts = headers.get("x-timestamp")
     nonce = headers.get("x-nonce")
@@ -32,8 +32,11 @@ def verify_signed_request(db: Session, headers: dict, method: str, path: str, bo
     # Nonce replay protection
     if db.get(Nonce, nonce) is not None:
         raise AuthError("Replay detected: nonce already used")
-    expires = datetime.utcnow() + timedelta(seconds=nonce_ttl)
-    db.add(Nonce(nonce=nonce, expires_at=expires))
+    # Callers that persist the nonce in a later transaction pass record_nonce=False;
+    # the nonce primary key still rejects a replay that races this check
+    if record_nonce:
+        expires = datetime.utcnow() + timedelta(seconds=nonce_ttl)
+        db.add(Nonce(nonce=nonce, expires_at=expires))
 
     api_key = db.get(ApiKey, key_id)
     if not api_key or api_key.revoked_at is not None or not api_key.can_write:
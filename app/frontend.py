@@ -0,0 +1,104 @@
+import os, re, stat
+from mimetypes import guess_type
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+# Bundlers put a content hash in the file name (main.8f3c2a1b.js, 453.1a2b3c4d.chunk.js),
+# so the URL changes whenever the content does and the file can be cached forever.
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Preferred order when the client accepts several encodings.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepted_encodings(headers: Headers) -> set[str]:
+    accepted = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class SPAStaticFiles(StaticFiles):
+    """
+    Serves a production frontend build (e.g. `npm run build` output).
+
+    - Hashed assets get a one-year immutable Cache-Control, index.html is always
+      revalidated and every other file (images, manifest) is cached for `max_age`.
+    - A sibling `<file>.br` / `<file>.gz` is served instead of the original when
+      the client accepts that encoding; requesting those files directly is a 404.
+    - Unknown paths without a file extension fall back to index.html so client-side
+      routes like /player/niko survive a reload.
+    """
+
+    def __init__(self, *, directory: str, max_age: int = 86400, **kwargs):
+        super().__init__(directory=directory, html=True, **kwargs)
+        self.max_age = max_age
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        # Precompressed variants are only reachable through content negotiation
+        if path.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+            raise HTTPException(status_code=404)
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            if e.status_code != 404 or not self._is_client_route(path):
+                raise
+        return self.index_response(scope)
+
+    def index_response(self, scope: Scope) -> Response:
+        full_path, stat_result = self.lookup_path("index.html")
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404)
+        return self.file_response(full_path, stat_result, scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        media_type = guess_type(str(full_path))[0] or "text/plain"
+
+        served_path, served_stat, encoding = full_path, stat_result, None
+        accepted = _accepted_encodings(request_headers)
+        for coding, suffix in ENCODINGS:
+            if coding not in accepted:
+                continue
+            candidate, candidate_stat = self.lookup_path(f"{full_path}{suffix}")
+            if candidate_stat is not None and stat.S_ISREG(candidate_stat.st_mode):
+                served_path, served_stat, encoding = candidate, candidate_stat, coding
+                break
+
+        response = FileResponse(served_path, status_code=status_code, stat_result=served_stat,
+                                media_type=media_type)
+        response.headers["cache-control"] = self._cache_control(str(full_path))
+        if self._has_variants(str(full_path)):
+            response.headers["vary"] = "Accept-Encoding"
+        if encoding:
+            response.headers["content-encoding"] = encoding
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def _cache_control(self, full_path: str) -> str:
+        name = os.path.basename(full_path)
+        if name.endswith(".html"):
+            return REVALIDATE
+        if HASHED_NAME.search(name):
+            return IMMUTABLE
+        return f"public, max-age={self.max_age}"
+
+    def _has_variants(self, full_path: str) -> bool:
+        return any(os.path.isfile(full_path + suffix) for _, suffix in ENCODINGS)
+
+    @staticmethod
+    def _is_client_route(path: str) -> bool:
+        path = path.strip("/")
+        if path == "api" or path.startswith("api/"):
+            return False
+        return "." not in path.rsplit("/", 1)[-1]
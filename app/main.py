@@ -1,16 +1,23 @@
-import os, json
+import os, json, asyncio
 from datetime import datetime, timedelta
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, ValidationError, validator
+from contextlib import asynccontextmanager
 from sqlalchemy import create_engine, select, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
-from models import Base, Player, Match, RatingHistory, Audit
-from elo import update_elo
+from models import Base, Player, Match, Audit, Season
 from auth import verify_signed_request, AuthError
 from logger_cfg import configure_logging
+from frontend import SPAStaticFiles
+from writer import MatchWriter, MatchSubmission, create_writer_engine
+from seasons import (
+    SeasonError, close_season, closed_peaks, current_season, history_rows, match_rows, ratings_before,
+    resolve_scope, standings,
+)
 
 HOST = os.getenv("APP_HOST", "0.0.0.0")
 PORT = int(os.getenv("APP_PORT", "8000"))
@@ -19,9 +26,31 @@ ELO_K = float(os.getenv("ELO_K", "32"))
 SIG_MAX_SKEW = int(os.getenv("SIG_MAX_SKEW_SECONDS", "300"))
 NONCE_TTL = int(os.getenv("NONCE_TTL_SECONDS", "900"))
 LOG_FILE = os.getenv("LOG_FILE")
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "64"))
+FRONTEND_DIR = os.getenv("FRONTEND_DIR", "frontend_build")
+FRONTEND_MAX_AGE = int(os.getenv("FRONTEND_MAX_AGE_SECONDS", "86400"))
 
 log = configure_logging(LOG_FILE)
-app = FastAPI(title="FIFA Pi")
+
+# DB setup
+engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+Base.metadata.create_all(engine)
+
+# All match writes go through one writer task per process (group commit)
+writer = MatchWriter(create_writer_engine(DB_PATH), k=ELO_K, max_batch=WRITE_BATCH_MAX, log=log)
+with writer.SessionLocal() as db, db.begin():
+    current_season(db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    writer.start()
+    yield
+    await writer.stop()
+
+
+app = FastAPI(title="FIFA Pi", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -32,12 +61,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# DB setup
-engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
-Base.metadata.create_all(engine)
+# The React build owns /static/js, /static/css etc., so the legacy pages move to /legacy when it is present
+frontend = SPAStaticFiles(directory=FRONTEND_DIR, max_age=FRONTEND_MAX_AGE) if os.path.isdir(FRONTEND_DIR) else None
+app.mount("/legacy" if frontend else "/static", StaticFiles(directory="static", html=True), name="static")
+
+class SeasonCloseIn(BaseModel):
+    next_name: str | None = None
 
-app.mount("/static", StaticFiles(directory="static", html=True), name="static")
 
 class MatchIn(BaseModel):
     p1_handle: str
@@ -55,7 +85,9 @@ class MatchIn(BaseModel):
 
 
 @app.get("/")
-def root():
+def root(request: Request):
+    if frontend:
+        return frontend.index_response(request.scope)
     return FileResponse("static/index.html")
 
 
@@ -64,19 +96,26 @@ def health():
     return {"ok": True}
 
 
+def scope_for(db, season: int | None, all_time: bool):
+    try:
+        return resolve_scope(db, season=season, all_time=all_time)
+    except SeasonError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @app.get("/api/leaderboard")
-def leaderboard():
+def leaderboard(season: int | None = None, all_time: bool = False):
     with SessionLocal() as db:
-        rows = db.query(Player).order_by(Player.current_elo.desc()).limit(100).all()
+        rows = standings(db, scope_for(db, season, all_time), limit=100)
         data = [
             {
-                "handle": r.handle,
-                "name": r.name,
-                "elo": round(r.current_elo, 1),
-                "played": r.matches_played,
-                "wins": r.wins,
-                "losses": r.losses,
-                "win_pct": round((r.wins / r.matches_played) * 100, 1) if r.matches_played else 0.0,
+                "handle": r["handle"],
+                "name": r["name"],
+                "elo": round(r["elo"], 1),
+                "played": r["played"],
+                "wins": r["wins"],
+                "losses": r["losses"],
+                "win_pct": round((r["wins"] / r["played"]) * 100, 1) if r["played"] else 0.0,
             }
             for r in rows
         ]
@@ -84,66 +123,73 @@ def leaderboard():
 
 
 @app.get("/api/players")
-def players():
+def players(season: int | None = None, all_time: bool = False):
     with SessionLocal() as db:
-        rows = db.query(Player).order_by(Player.handle.asc()).all()
+        rows = sorted(standings(db, scope_for(db, season, all_time)), key=lambda r: r["handle"])
         return {"players": [
-            {"handle": p.handle, "name": p.name, "elo": round(p.current_elo,1),
-             "played": p.matches_played, "wins": p.wins, "losses": p.losses}
+            {"handle": p["handle"], "name": p["name"], "elo": round(p["elo"],1),
+             "played": p["played"], "wins": p["wins"], "losses": p["losses"]}
             for p in rows
         ]}
 
 
 @app.get("/api/player/{handle}")
-def player_detail(handle: str):
+def player_detail(handle: str, season: int | None = None, all_time: bool = False):
     with SessionLocal() as db:
         p = db.query(Player).filter(Player.handle == handle).first()
         if not p:
             raise HTTPException(status_code=404, detail="Player not found")
-        recent = (
-            db.query(Match)
-              .filter((Match.p1_id == p.id) | (Match.p2_id == p.id))
-              .order_by(Match.played_at.desc(), Match.id.desc())
-              .limit(20)
-              .all()
-        )
+        scope = scope_for(db, season, all_time)
+        found = standings(db, scope, player_id=p.id)
+        # Sat out a closed season: report the rating held through it
+        stats = found[0] if found else {"elo": ratings_before(db, scope).get(p.id, p.current_elo),
+                                        "played": 0, "wins": 0, "losses": 0}
+        recent = match_rows(db, scope, player_id=p.id, newest_first=True, limit=20)
+        ids = {m.p1_id for m in recent} | {m.p2_id for m in recent}
+        player_map = {pl.id: pl.handle for pl in db.query(Player).filter(Player.id.in_(ids))}
         return {
-            "player": {"handle": p.handle, "name": p.name, "elo": round(p.current_elo,1),
-                        "played": p.matches_played, "wins": p.wins, "losses": p.losses},
+            "player": {"handle": p.handle, "name": p.name, "elo": round(stats["elo"],1),
+                        "played": stats["played"], "wins": stats["wins"], "losses": stats["losses"]},
             "recent": [
                 {"played_at": m.played_at.isoformat(),
-                 "p1": db.query(Player).get(m.p1_id).handle,
-                 "p2": db.query(Player).get(m.p2_id).handle,
+                 "p1": player_map[m.p1_id],
+                 "p2": player_map[m.p2_id],
                  "score": f"{m.p1_score}-{m.p2_score}"}
                 for m in recent
             ]
         }
-    
+
 
 @app.get("/api/rating-history")
-def get_rating_history():
+def get_rating_history(season: int | None = None, all_time: bool = False):
     """Get rating history for all players to show ELO progression."""
     with SessionLocal() as db:
-        # Get all matches in chronological order
-        matches = db.query(Match).order_by(Match.played_at.asc(), Match.id.asc()).all()
+        scope = scope_for(db, season, all_time)
+        # Get matches in scope in chronological order
+        matches = match_rows(db, scope)
+
+        # Rating changes grouped by the match that caused them
+        changes = {}
+        for r in history_rows(db, scope):
+            changes.setdefault(r.match_id, []).append(r)
 
         # Get all players
         players = db.query(Player).all()
         player_map = {p.id: p.handle for p in players}
 
-        # Track current ratings (everyone starts at 1000)
-        current_ratings = {p.handle: 1000.0 for p in players}
+        # Ratings carry over between seasons, so each line starts at the player's rating
+        # before their first match in scope, or the rating they held throughout it
+        start = ratings_before(db, scope)
+        for match in matches:
+            for r in changes.get(match.match_id, []):
+                start.setdefault(r.player_id, r.pre_elo)
+        current_ratings = {p.handle: start.get(p.id, p.current_elo) for p in players}
         history = [{"match": 0, **current_ratings.copy()}]
 
         # Process each match to build rating history
         for i, match in enumerate(matches):
-            # Get rating changes for this match
-            ratings = db.query(RatingHistory).filter(
-                RatingHistory.match_id == match.id
-            ).all()
-
             # Update ratings based on this match
-            for r in ratings:
+            for r in changes.get(match.match_id, []):
                 player_handle = player_map.get(r.player_id)
                 if player_handle:
                     current_ratings[player_handle] = r.post_elo
@@ -158,58 +204,61 @@ def get_rating_history():
 
 
 @app.get("/api/matches")
-def get_all_matches():
-    """Get all matches with player names."""
+def get_all_matches(season: int | None = None, all_time: bool = False):
+    """Get all matches in scope with player names."""
     with SessionLocal() as db:
-        matches = db.query(Match).order_by(Match.played_at.desc(), Match.id.desc()).all()
-        result = []
-        for m in matches:
-            p1 = db.query(Player).get(m.p1_id)
-            p2 = db.query(Player).get(m.p2_id)
-            result.append({
+        matches = match_rows(db, scope_for(db, season, all_time), newest_first=True)
+        player_map = {p.id: p.handle for p in db.query(Player).all()}
+        return {"matches": [
+            {
                 "played_at": m.played_at.isoformat(),
-                "p1": p1.handle,
-                "p2": p2.handle,
+                "p1": player_map[m.p1_id],
+                "p2": player_map[m.p2_id],
                 "score": f"{m.p1_score}-{m.p2_score}"
-            })
-        return {"matches": result}
+            }
+            for m in matches
+        ]}
 
 
 @app.get("/api/player-stats")
-def get_player_stats():
+def get_player_stats(season: int | None = None, all_time: bool = False):
     """Get all players with their all-time high ELO calculated from rating history."""
     with SessionLocal() as db:
-        players = db.query(Player).all()
-        result = []
-
-        for player in players:
-            # Get all rating history for this player
-            history = db.query(RatingHistory).filter(
-                RatingHistory.player_id == player.id
-            ).all()
-
-            # Calculate all-time high from history
-            all_time_high = player.current_elo  # Start with current as minimum
-
-            # Check all historical ratings
-            for h in history:
-                if h.post_elo > all_time_high:
-                    all_time_high = h.post_elo
-                # Also check pre_elo in case it was higher
-                if h.pre_elo > all_time_high:
-                    all_time_high = h.pre_elo
-
-            result.append({
-                "handle": player.handle,
-                "name": player.name,
-                "current_elo": round(player.current_elo, 1),
-                "all_time_high": round(all_time_high, 1),
-                "played": player.matches_played,
-                "wins": player.wins,
-                "losses": player.losses
-            })
+        scope = scope_for(db, season, all_time)
+        rows = standings(db, scope, with_peaks=True)
+        # Peaks from earlier seasons count too, whatever scope the totals cover
+        earlier = closed_peaks(db, scope, [r["player_id"] for r in rows])
+        return {"players": [
+            {
+                "handle": r["handle"],
+                "name": r["name"],
+                "current_elo": round(r["elo"], 1),
+                "all_time_high": round(max(r["peak_elo"], earlier.get(r["player_id"], r["peak_elo"])), 1),
+                "played": r["played"],
+                "wins": r["wins"],
+                "losses": r["losses"]
+            }
+            for r in rows
+        ]}
 
-        return {"players": result}
+
+@app.get("/api/seasons")
+def get_seasons():
+    """List seasons, newest first, with the champion of each closed one."""
+    with SessionLocal() as db:
+        rows = db.query(Season).order_by(Season.id.desc()).all()
+        return {"seasons": [
+            {
+                "id": s.id,
+                "name": s.name,
+                "started_at": s.started_at.isoformat(),
+                "closed_at": s.closed_at.isoformat() if s.closed_at else None,
+                "current": s.closed_at is None,
+                "champion": s.champion.handle if s.champion else None,
+                "matches": s.matches_played if s.closed_at else db.query(func.count(Match.id)).scalar(),
+            }
+            for s in rows
+        ]}
 
 
 @app.get("/add-match", response_class=FileResponse)
@@ -221,76 +270,33 @@ def get_add_match_form():
     return FileResponse(path)
 
 
+def client_ip(request: Request):
+    return request.headers.get("cf-connecting-ip") or (request.client.host if request.client else None)
+
+
+def is_nonce_conflict(e: IntegrityError) -> bool:
+    # SQLite reports the violated primary key as "UNIQUE constraint failed: nonces.nonce"
+    return "nonces.nonce" in str(e.orig)
+
+
 @app.post("/api/matches")
 async def create_match_insecure(request: Request):
     body = await request.body()
-    with SessionLocal() as db:
-        # Auth
-        key = "d8e8f851fb8e4a02"
-        sig_valid = True
-
-        data = MatchIn.parse_raw(body)
-        # Players ensure
-        def get_or_create(handle: str):
-            p = db.query(Player).filter(Player.handle == handle).first()
-            if not p:
-                p = Player(handle=handle, name=handle)
-                db.add(p)
-                db.flush()
-            return p
-
-        p1 = get_or_create(data.p1_handle)
-        p2 = get_or_create(data.p2_handle)
-
-        # Elo update
-        new_p1, new_p2 = update_elo(p1.current_elo, p2.current_elo, data.p1_score, data.p2_score, k=float(os.getenv("ELO_K","32")))
-
-        # Persist match
-        m = Match(
-            played_at=data.played_at,
-            p1_id=p1.id,
-            p2_id=p2.id,
-            p1_score=data.p1_score,
-            p2_score=data.p2_score,
-            created_by_key_id=key,
-        )
-        db.add(m)
-        db.flush()
-
-        db.add(RatingHistory(player_id=p1.id, match_id=m.id, pre_elo=p1.current_elo, post_elo=new_p1))
-        db.add(RatingHistory(player_id=p2.id, match_id=m.id, pre_elo=p2.current_elo, post_elo=new_p2))
-
-        # Update player aggregates
-        p1.matches_played += 1
-        p2.matches_played += 1
-        if data.p1_score > data.p2_score:
-            p1.wins += 1; p2.losses += 1
-        elif data.p2_score > data.p1_score:
-            p2.wins += 1; p1.losses += 1
-        # draws don't change wins/losses
-        p1.current_elo = new_p1
-        p2.current_elo = new_p2
-
-        db.add(Audit(
-            key_id=key,
-            action="create_match",
-            resource_type="match",
-            resource_id=str(m.id),
-            ip=request.headers.get("cf-connecting-ip") or (request.client.host if request.client else None),
-            user_agent=request.headers.get("user-agent"),
-            signature_valid=sig_valid,
-        ))
-
-        db.commit()
-
-        return {"ok": True, "match_id": m.id}
+    data = MatchIn.parse_raw(body)
+    match_id = await writer.submit(MatchSubmission(
+        **data.dict(),
+        key_id="d8e8f851fb8e4a02",
+        ip=client_ip(request),
+        user_agent=request.headers.get("user-agent"),
+    ))
+    return {"ok": True, "match_id": match_id}
 
 
 @app.post("/api/matches-secure")
 async def create_match(request: Request):
     body = await request.body()
     with SessionLocal() as db:
-        # Auth
+        # Auth; the nonce is stored by the writer in the same transaction as the match
         try:
             key = verify_signed_request(
                 db=db,
@@ -300,10 +306,9 @@ async def create_match(request: Request):
                 body_bytes=body,
                 max_skew=SIG_MAX_SKEW,
                 nonce_ttl=NONCE_TTL,
+                record_nonce=False,
             )
-            sig_valid = True
         except AuthError as e:
-            sig_valid = False
             db.add(Audit(
                 key_id=request.headers.get("x-key-id"),
                 action="create_match",
@@ -316,61 +321,93 @@ async def create_match(request: Request):
             db.commit()
             raise HTTPException(status_code=401, detail=str(e))
 
-        data = MatchIn.parse_raw(body)
-        # Players ensure
-        def get_or_create(handle: str):
-            p = db.query(Player).filter(Player.handle == handle).first()
-            if not p:
-                p = Player(handle=handle, name=handle)
-                db.add(p)
-                db.flush()
-            return p
-
-        p1 = get_or_create(data.p1_handle)
-        p2 = get_or_create(data.p2_handle)
-
-        # Elo update
-        new_p1, new_p2 = update_elo(p1.current_elo, p2.current_elo, data.p1_score, data.p2_score, k=float(os.getenv("ELO_K","32")))
-
-        # Persist match
-        m = Match(
-            played_at=data.played_at,
-            p1_id=p1.id,
-            p2_id=p2.id,
-            p1_score=data.p1_score,
-            p2_score=data.p2_score,
-            created_by_key_id=key.key_id,
-        )
-        db.add(m)
-        db.flush()
-
-        db.add(RatingHistory(player_id=p1.id, match_id=m.id, pre_elo=p1.current_elo, post_elo=new_p1))
-        db.add(RatingHistory(player_id=p2.id, match_id=m.id, pre_elo=p2.current_elo, post_elo=new_p2))
-
-        # Update player aggregates
-        p1.matches_played += 1
-        p2.matches_played += 1
-        if data.p1_score > data.p2_score:
-            p1.wins += 1; p2.losses += 1
-        elif data.p2_score > data.p1_score:
-            p2.wins += 1; p1.losses += 1
-        # draws don't change wins/losses
-        p1.current_elo = new_p1
-        p2.current_elo = new_p2
-
-        db.add(Audit(
+    data = MatchIn.parse_raw(body)
+    try:
+        match_id = await writer.submit(MatchSubmission(
+            **data.dict(),
             key_id=key.key_id,
-            action="create_match",
-            resource_type="match",
-            resource_id=str(m.id),
-            ip=request.headers.get("cf-connecting-ip") or (request.client.host if request.client else None),
+            ip=client_ip(request),
             user_agent=request.headers.get("user-agent"),
-            signature_valid=sig_valid,
+            nonce=request.headers.get("x-nonce"),
+            nonce_expires_at=datetime.utcnow() + timedelta(seconds=NONCE_TTL),
         ))
+    except IntegrityError as e:
+        if not is_nonce_conflict(e):
+            raise
+        # Another request with the same nonce was committed first
+        detail = "Replay detected: nonce already used"
+        with SessionLocal() as db:
+            db.add(Audit(
+                key_id=key.key_id,
+                action="create_match",
+                resource_type="match",
+                ip=request.client.host if request.client else None,
+                user_agent=request.headers.get("user-agent"),
+                signature_valid=False,
+                note=detail,
+            ))
+            db.commit()
+        raise HTTPException(status_code=401, detail=detail)
+    return {"ok": True, "match_id": match_id}
+
 
+@app.post("/api/seasons/close")
+async def close_current_season(request: Request):
+    body = await request.body()
+    with SessionLocal() as db:
+        try:
+            key = verify_signed_request(
+                db=db,
+                headers=request.headers,
+                method=request.method,
+                path=str(request.url.path),
+                body_bytes=body,
+                max_skew=SIG_MAX_SKEW,
+                nonce_ttl=NONCE_TTL,
+            )
+        except AuthError as e:
+            db.add(Audit(
+                key_id=request.headers.get("x-key-id"),
+                action="close_season",
+                resource_type="season",
+                ip=client_ip(request),
+                user_agent=request.headers.get("user-agent"),
+                signature_valid=False,
+                note=str(e),
+            ))
+            db.commit()
+            raise HTTPException(status_code=401, detail=str(e))
+        # Validate before the nonce is committed, so a bad body does not burn it
+        try:
+            data = SeasonCloseIn.parse_raw(body or b"{}")
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors())
         db.commit()
 
-        return {"ok": True, "match_id": m.id}
+    def _close():
+        # Same BEGIN IMMEDIATE engine as the match writer, so no submission lands mid-close
+        with writer.SessionLocal() as db, db.begin():
+            season = close_season(db, data.next_name)
+            db.add(Audit(
+                key_id=key.key_id,
+                action="close_season",
+                resource_type="season",
+                resource_id=str(season.id),
+                ip=client_ip(request),
+                user_agent=request.headers.get("user-agent"),
+                signature_valid=True,
+            ))
+            return {"ok": True, "season_id": season.id, "champion": season.champion.handle if season.champion else None}
+
+    try:
+        return await asyncio.to_thread(_close)
+    except SeasonError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+# Mounted last so every API route above takes precedence over the SPA fallback
+if frontend:
+    app.mount("/", frontend, name="frontend")
 
 if __name__ == "__main__":
     import uvicorn
@@ -39,6 +39,61 @@ class RatingHistory(Base):
     pre_elo = Column(Float, nullable=False)
     post_elo = Column(Float, nullable=False)
 
+class Season(Base):
+    __tablename__ = "seasons"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(80), nullable=False, unique=True)
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    closed_at = Column(DateTime, nullable=True)  # NULL for the current season
+    champion_id = Column(Integer, ForeignKey("players.id"), nullable=True)
+    matches_played = Column(Integer, nullable=False, default=0)
+
+    champion = relationship("Player", foreign_keys=[champion_id])
+
+# Closed seasons move out of `matches`/`rating_history`; archived matches keep their original id
+class ArchivedMatch(Base):
+    __tablename__ = "archived_matches"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    season_id = Column(Integer, ForeignKey("seasons.id"), nullable=False, index=True)
+    played_at = Column(DateTime, nullable=False)
+    p1_id = Column(Integer, ForeignKey("players.id"), nullable=False)
+    p2_id = Column(Integer, ForeignKey("players.id"), nullable=False)
+    p1_score = Column(Integer, nullable=False)
+    p2_score = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    created_by_key_id = Column(String(64), nullable=False)
+
+class ArchivedRatingHistory(Base):
+    __tablename__ = "archived_rating_history"
+    id = Column(Integer, primary_key=True)
+    season_id = Column(Integer, ForeignKey("seasons.id"), nullable=False, index=True)
+    player_id = Column(Integer, ForeignKey("players.id"), nullable=False)
+    match_id = Column(Integer, ForeignKey("archived_matches.id"), nullable=False)
+    pre_elo = Column(Float, nullable=False)
+    post_elo = Column(Float, nullable=False)
+
+class SeasonStanding(Base):
+    """Per-player rollup computed when a season is closed."""
+    __tablename__ = "season_standings"
+    id = Column(Integer, primary_key=True)
+    season_id = Column(Integer, ForeignKey("seasons.id"), nullable=False, index=True)
+    player_id = Column(Integer, ForeignKey("players.id"), nullable=False)
+    rank = Column(Integer, nullable=False)
+    final_elo = Column(Float, nullable=False)
+    peak_elo = Column(Float, nullable=False)
+    matches_played = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
+    goals_for = Column(Integer, nullable=False, default=0)
+    goals_against = Column(Integer, nullable=False, default=0)
+
+    player = relationship("Player", foreign_keys=[player_id])
+
+    __table_args__ = (
+        UniqueConstraint('season_id', 'player_id', name='season_standing_unique'),
+    )
+
 class ApiKey(Base):
     __tablename__ = "api_keys"
     key_id = Column(String(64), primary_key=True)
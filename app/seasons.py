@@ -0,0 +1,260 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy import Integer, delete, func, insert, literal, select, union_all, update
+from sqlalchemy.orm import Session
+from models import Player, Match, RatingHistory, Season, ArchivedMatch, ArchivedRatingHistory, SeasonStanding
+
+STARTING_ELO = 1000.0
+
+
+class SeasonError(Exception):
+    pass
+
+
+@dataclass
+class Scope:
+    """Which matches a query covers: the current season (default), one closed season, or all time."""
+    season_id: int | None = None
+    all_time: bool = False
+
+
+def current_season(db: Session) -> Season:
+    """Returns the open season, creating the first one (covering any existing matches) if needed."""
+    season = db.query(Season).filter(Season.closed_at.is_(None)).order_by(Season.id.desc()).first()
+    if not season:
+        first_match = db.query(func.min(Match.played_at)).scalar()
+        count = db.query(func.count(Season.id)).scalar()
+        season = Season(name=f"Season {count + 1}", started_at=first_match or datetime.utcnow())
+        db.add(season)
+        db.flush()
+    return season
+
+
+def resolve_scope(db: Session, season: int | None = None, all_time: bool = False) -> Scope:
+    if all_time:
+        return Scope(all_time=True)
+    if season is None:
+        return Scope()
+    s = db.get(Season, season)
+    if s is None:
+        raise SeasonError(f"Season {season} not found")
+    if s.closed_at is None:
+        return Scope()
+    return Scope(season_id=s.id)
+
+
+def _hot_matches(player_id: int | None):
+    q = select(
+        literal(None, Integer).label("season_id"), Match.id.label("match_id"), Match.played_at,
+        Match.p1_id, Match.p2_id, Match.p1_score, Match.p2_score,
+    )
+    if player_id is not None:
+        q = q.where((Match.p1_id == player_id) | (Match.p2_id == player_id))
+    return q
+
+
+def _archived_matches(season_id: int | None, player_id: int | None):
+    q = select(
+        ArchivedMatch.season_id, ArchivedMatch.id.label("match_id"), ArchivedMatch.played_at,
+        ArchivedMatch.p1_id, ArchivedMatch.p2_id, ArchivedMatch.p1_score, ArchivedMatch.p2_score,
+    )
+    if season_id is not None:
+        q = q.where(ArchivedMatch.season_id == season_id)
+    if player_id is not None:
+        q = q.where((ArchivedMatch.p1_id == player_id) | (ArchivedMatch.p2_id == player_id))
+    return q
+
+
+def match_rows(db: Session, scope: Scope, player_id: int | None = None,
+               newest_first: bool = False, limit: int | None = None):
+    """
+    Matches in scope as rows of (season_id, match_id, played_at, p1_id, p2_id, p1_score, p2_score),
+    oldest first. season_id is None for the current season.
+    """
+    if scope.all_time:
+        q = union_all(_archived_matches(None, player_id), _hot_matches(player_id))
+    elif scope.season_id is not None:
+        q = _archived_matches(scope.season_id, player_id)
+    else:
+        q = _hot_matches(player_id)
+    sub = q.subquery()
+    # Current season (NULL season_id) sorts after every closed season
+    order = [sub.c.season_id.is_(None), sub.c.season_id, sub.c.played_at, sub.c.match_id]
+    stmt = select(sub).order_by(*[o.desc() for o in order] if newest_first else order)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return db.execute(stmt).all()
+
+
+def history_rows(db: Session, scope: Scope):
+    """Rating changes in scope as rows of (season_id, match_id, player_id, pre_elo, post_elo)."""
+    hot = select(
+        literal(None, Integer).label("season_id"), RatingHistory.match_id,
+        RatingHistory.player_id, RatingHistory.pre_elo, RatingHistory.post_elo,
+    )
+    archived = select(
+        ArchivedRatingHistory.season_id, ArchivedRatingHistory.match_id,
+        ArchivedRatingHistory.player_id, ArchivedRatingHistory.pre_elo, ArchivedRatingHistory.post_elo,
+    )
+    if scope.all_time:
+        return db.execute(union_all(archived, hot)).all()
+    if scope.season_id is not None:
+        return db.execute(archived.where(ArchivedRatingHistory.season_id == scope.season_id)).all()
+    return db.execute(hot).all()
+
+
+def ratings_before(db: Session, scope: Scope) -> dict[int, float]:
+    """
+    For a closed season, each player's rating going into it (the last archived change
+    before it, else the starting rating). Other scopes need nothing extra: all time starts
+    from scratch and the current season falls back to current_elo.
+    """
+    if scope.season_id is None:
+        return {}
+    ratings = {p.id: STARTING_ELO for p in db.query(Player.id)}
+    earlier = (
+        db.query(ArchivedRatingHistory.player_id, ArchivedRatingHistory.post_elo)
+          .filter(ArchivedRatingHistory.season_id < scope.season_id)
+          .order_by(ArchivedRatingHistory.match_id.asc())
+    )
+    for player_id, post_elo in earlier:
+        ratings[player_id] = post_elo
+    return ratings
+
+
+def standings(db: Session, scope: Scope, player_id: int | None = None, limit: int | None = None,
+              with_peaks: bool = False) -> list[dict]:
+    """
+    Per-player totals in scope, highest rating first: handle, name, elo, played, wins, losses,
+    plus peak_elo when `with_peaks` is set (it scans rating history, so only ask when needed).
+    Closed seasons are read from their rollup; all time adds the rollups to the live totals.
+    """
+    if scope.season_id is not None:
+        q = (
+            db.query(SeasonStanding, Player)
+              .join(Player, Player.id == SeasonStanding.player_id)
+              .filter(SeasonStanding.season_id == scope.season_id)
+              .order_by(SeasonStanding.rank.asc())
+        )
+        if player_id is not None:
+            q = q.filter(SeasonStanding.player_id == player_id)
+        return [
+            {"player_id": p.id, "handle": p.handle, "name": p.name, "elo": s.final_elo,
+             "peak_elo": s.peak_elo, "played": s.matches_played, "wins": s.wins, "losses": s.losses}
+            for s, p in q.limit(limit).all()
+        ]
+
+    q = db.query(Player).order_by(Player.current_elo.desc())
+    if player_id is not None:
+        q = q.filter(Player.id == player_id)
+    result = [
+        {"player_id": p.id, "handle": p.handle, "name": p.name, "elo": p.current_elo,
+         "played": p.matches_played, "wins": p.wins, "losses": p.losses}
+        for p in q.limit(limit).all()
+    ]
+    ids = [r["player_id"] for r in result]
+
+    if with_peaks:
+        peaks = {
+            pid: max(max_pre, max_post)
+            for pid, max_pre, max_post in db.query(
+                RatingHistory.player_id, func.max(RatingHistory.pre_elo), func.max(RatingHistory.post_elo)
+            ).filter(RatingHistory.player_id.in_(ids)).group_by(RatingHistory.player_id)
+        }
+        for r in result:
+            r["peak_elo"] = max(r["elo"], peaks.get(r["player_id"], r["elo"]))
+
+    if scope.all_time:
+        closed = {
+            row.player_id: row
+            for row in db.query(
+                SeasonStanding.player_id,
+                func.max(SeasonStanding.peak_elo).label("peak_elo"),
+                func.sum(SeasonStanding.matches_played).label("played"),
+                func.sum(SeasonStanding.wins).label("wins"),
+                func.sum(SeasonStanding.losses).label("losses"),
+            ).filter(SeasonStanding.player_id.in_(ids)).group_by(SeasonStanding.player_id)
+        }
+        for r in result:
+            c = closed.get(r["player_id"])
+            if c:
+                if with_peaks:
+                    r["peak_elo"] = max(r["peak_elo"], c.peak_elo)
+                r["played"] += c.played
+                r["wins"] += c.wins
+                r["losses"] += c.losses
+    return result
+
+
+def closed_peaks(db: Session, scope: Scope, player_ids: list[int]) -> dict[int, float]:
+    """
+    Highest rating each player reached in closed seasons up to the scope (every closed
+    season for the live scopes), read from the rollups. Combine with a scope's peak_elo
+    to get an all-time high as of that scope.
+    """
+    q = (
+        db.query(SeasonStanding.player_id, func.max(SeasonStanding.peak_elo))
+          .filter(SeasonStanding.player_id.in_(player_ids))
+          .group_by(SeasonStanding.player_id)
+    )
+    if scope.season_id is not None:
+        q = q.filter(SeasonStanding.season_id <= scope.season_id)
+    return dict(q.all())
+
+
+def close_season(db: Session, next_name: str | None = None) -> Season:
+    """
+    Closes the current season inside the caller's transaction: writes the per-player rollup and
+    champion, moves its matches and rating history to the archive tables, resets the per-season
+    totals on players and opens the next season. Ratings carry over. Returns the closed season.
+    """
+    season = current_season(db)
+    next_name = next_name or f"Season {season.id + 1}"
+    if db.query(Season).filter(Season.name == next_name).first():
+        raise SeasonError(f"Season name already used: {next_name}")
+
+    totals = defaultdict(lambda: {"draws": 0, "goals_for": 0, "goals_against": 0})
+    matches = match_rows(db, Scope())
+    for m in matches:
+        for pid, scored, conceded in ((m.p1_id, m.p1_score, m.p2_score), (m.p2_id, m.p2_score, m.p1_score)):
+            totals[pid]["goals_for"] += scored
+            totals[pid]["goals_against"] += conceded
+            if scored == conceded:
+                totals[pid]["draws"] += 1
+
+    ranked = [r for r in standings(db, Scope(), with_peaks=True) if r["played"]]
+    for rank, r in enumerate(ranked, start=1):
+        db.add(SeasonStanding(
+            season_id=season.id,
+            player_id=r["player_id"],
+            rank=rank,
+            final_elo=r["elo"],
+            peak_elo=r["peak_elo"],
+            matches_played=r["played"],
+            wins=r["wins"],
+            losses=r["losses"],
+            **totals[r["player_id"]],
+        ))
+
+    db.execute(insert(ArchivedMatch).from_select(
+        ["season_id", "id", "played_at", "p1_id", "p2_id", "p1_score", "p2_score",
+         "created_at", "created_by_key_id"],
+        select(literal(season.id), Match.id, Match.played_at, Match.p1_id, Match.p2_id,
+               Match.p1_score, Match.p2_score, Match.created_at, Match.created_by_key_id),
+    ))
+    db.execute(insert(ArchivedRatingHistory).from_select(
+        ["season_id", "match_id", "player_id", "pre_elo", "post_elo"],
+        select(literal(season.id), RatingHistory.match_id, RatingHistory.player_id,
+               RatingHistory.pre_elo, RatingHistory.post_elo),
+    ))
+    db.execute(delete(RatingHistory))
+    db.execute(delete(Match))
+    db.execute(update(Player).values(matches_played=0, wins=0, losses=0))
+
+    season.closed_at = datetime.utcnow()
+    season.champion_id = ranked[0]["player_id"] if ranked else None
+    season.matches_played = len(matches)
+    db.add(Season(name=next_name, started_at=season.closed_at))
+    db.flush()
+    return season
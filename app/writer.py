@@ -0,0 +1,197 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import Session, sessionmaker
+from models import Player, Match, RatingHistory, Audit, Nonce, ArchivedMatch
+from elo import update_elo
+
+
+@dataclass
+class MatchSubmission:
+    p1_handle: str
+    p2_handle: str
+    p1_score: int
+    p2_score: int
+    played_at: datetime
+    key_id: str
+    ip: str | None = None
+    user_agent: str | None = None
+    nonce: str | None = None
+    nonce_expires_at: datetime | None = None
+    future: asyncio.Future | None = field(default=None, repr=False)
+
+
+def create_writer_engine(db_path: str, busy_timeout: float = 30.0):
+    """
+    Engine for the writer only. Every transaction starts with BEGIN IMMEDIATE so the
+    SQLite write lock is held before ratings are read; with several uvicorn workers
+    each one has its own writer, and this keeps their Elo updates serialized.
+    """
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False, "timeout": busy_timeout},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself (pysqlite defers it), which also makes SAVEPOINT work
+        dbapi_connection.isolation_level = None
+        cur = dbapi_connection.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+
+def _get_or_create(db: Session, handle: str) -> Player:
+    p = db.query(Player).filter(Player.handle == handle).first()
+    if not p:
+        p = Player(handle=handle, name=handle)
+        db.add(p)
+        db.flush()
+    return p
+
+
+def _next_match_id(db: Session) -> int:
+    # `matches` is emptied when a season closes and SQLite would reuse ids from 1,
+    # so continue after the highest id ever issued, archived ones included
+    hot = db.query(func.max(Match.id)).scalar() or 0
+    archived = db.query(func.max(ArchivedMatch.id)).scalar() or 0
+    return max(hot, archived) + 1
+
+
+def apply_match(db: Session, sub: MatchSubmission, k: float) -> int:
+    """Records one match, its rating history and audit row, and updates both players."""
+    if sub.nonce:
+        db.add(Nonce(nonce=sub.nonce, expires_at=sub.nonce_expires_at))
+
+    p1 = _get_or_create(db, sub.p1_handle)
+    p2 = _get_or_create(db, sub.p2_handle)
+
+    # Elo update
+    new_p1, new_p2 = update_elo(p1.current_elo, p2.current_elo, sub.p1_score, sub.p2_score, k=k)
+
+    # Persist match
+    m = Match(
+        id=_next_match_id(db),
+        played_at=sub.played_at,
+        p1_id=p1.id,
+        p2_id=p2.id,
+        p1_score=sub.p1_score,
+        p2_score=sub.p2_score,
+        created_by_key_id=sub.key_id,
+    )
+    db.add(m)
+    db.flush()
+
+    db.add(RatingHistory(player_id=p1.id, match_id=m.id, pre_elo=p1.current_elo, post_elo=new_p1))
+    db.add(RatingHistory(player_id=p2.id, match_id=m.id, pre_elo=p2.current_elo, post_elo=new_p2))
+
+    # Update player aggregates
+    p1.matches_played += 1
+    p2.matches_played += 1
+    if sub.p1_score > sub.p2_score:
+        p1.wins += 1; p2.losses += 1
+    elif sub.p2_score > sub.p1_score:
+        p2.wins += 1; p1.losses += 1
+    # draws don't change wins/losses
+    p1.current_elo = new_p1
+    p2.current_elo = new_p2
+
+    db.add(Audit(
+        key_id=sub.key_id,
+        action="create_match",
+        resource_type="match",
+        resource_id=str(m.id),
+        ip=sub.ip,
+        user_agent=sub.user_agent,
+        signature_valid=True,
+    ))
+    db.flush()
+    return m.id
+
+
+class MatchWriter:
+    """
+    Single writer for match submissions.
+
+    Requests enqueue a MatchSubmission and await its future. The writer task takes
+    everything pending (up to `max_batch`), applies it in arrival order inside one
+    transaction and commits once, so concurrent submitters share a single fsync
+    instead of fighting over the SQLite lock. Each submission runs in its own
+    SAVEPOINT: one that fails (e.g. a replayed nonce) is rolled back and rejected
+    without taking the rest of the batch with it.
+    """
+
+    def __init__(self, engine, k: float, max_batch: int = 64, log=None):
+        self.SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+        self.k = k
+        self.max_batch = max_batch
+        self.log = log
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, sub: MatchSubmission) -> int:
+        """Queues a submission and returns its match_id once the batch is committed."""
+        if self._task is None:
+            raise RuntimeError("MatchWriter is not running")
+        sub.future = asyncio.get_running_loop().create_future()
+        await self._queue.put(sub)
+        return await sub.future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                sub = self._queue.get_nowait()
+                if sub is None:
+                    stopping = True
+                    break
+                batch.append(sub)
+
+            try:
+                results = await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                if self.log:
+                    self.log.error("match_batch_failed", size=len(batch), error=str(e))
+                results = [e] * len(batch)
+
+            for sub, result in zip(batch, results):
+                if sub.future.done():
+                    continue  # caller went away
+                if isinstance(result, Exception):
+                    sub.future.set_exception(result)
+                else:
+                    sub.future.set_result(result)
+
+    def _write_batch(self, batch: list[MatchSubmission]) -> list:
+        results = []
+        with self.SessionLocal() as db:
+            with db.begin():
+                for sub in batch:
+                    try:
+                        with db.begin_nested():
+                            results.append(apply_match(db, sub, self.k))
+                    except Exception as e:
+                        results.append(e)
+        return results
@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
 import {
   Card,
   CardContent,
@@ -8,6 +8,7 @@ import {
 } from '@mui/material';
 import { EmojiEvents } from '@mui/icons-material';
 import { getPlayerColor } from '../utils/playerColors';
+import { fetchSeasons } from '../services/api';
 
 interface Champion {
   name: string;
@@ -18,11 +19,36 @@ interface Champion {
 const Champions: React.FC = () => {
   const theme = useTheme();
 
-  const champions: Champion[] = [
+  // Titles won before seasons were tracked by the backend
+  const [champions, setChampions] = useState<Champion[]>([
     { name: 'Niko', wins: 5, color: getPlayerColor('Niko') },
     { name: 'Joel', wins: 1, color: getPlayerColor('Joel') },
     { name: 'Arul', wins: 1, color: getPlayerColor('Arul') },
-  ];
+  ]);
+
+  useEffect(() => {
+    const loadSeasonChampions = async () => {
+      const seasons = await fetchSeasons();
+      const winners = seasons.filter(s => s.champion).map(s => s.champion as string);
+      if (winners.length === 0) return;
+
+      setChampions(prev => {
+        const updated = prev.map(c => ({ ...c }));
+        winners.forEach(handle => {
+          const existing = updated.find(c => c.name.toLowerCase() === handle.toLowerCase());
+          if (existing) {
+            existing.wins += 1;
+          } else {
+            const name = handle.charAt(0).toUpperCase() + handle.slice(1);
+            updated.push({ name, wins: 1, color: getPlayerColor(name) });
+          }
+        });
+        return updated;
+      });
+    };
+
+    loadSeasonChampions();
+  }, []);
 
   const sortedChampions = [...champions].sort((a, b) => b.wins - a.wins);
 
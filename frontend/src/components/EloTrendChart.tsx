@@ -18,7 +18,7 @@ import {
   Legend,
 } from "recharts";
 import { TrendingUp } from "@mui/icons-material";
-import { fetchPlayers, fetchAllMatches } from "../services/api";
+import { API_URL, fetchPlayers, fetchAllMatches } from "../services/api";
 import { getPlayerColors } from "../utils/playerColors";
 
 interface EloHistoryPoint {
@@ -37,9 +37,7 @@ const EloTrendChart: React.FC = () => {
     const loadEloData = async () => {
       try {
         // Fetch actual rating history from the backend
-        const response = await fetch(
-          "http://localhost:8000/api/rating-history"
-        );
+        const response = await fetch(`${API_URL}/api/rating-history`);
         const data = await response.json();
         const history = data.history;
 
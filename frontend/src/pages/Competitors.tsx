@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Container, Box, Typography, Card, CardContent, Avatar, Chip } from '@mui/material';
 import Navigation from '../components/Navigation';
 import { EmojiEvents, SportsEsports } from '@mui/icons-material';
-import { fetchPlayers } from '../services/api';
+import { fetchPlayers, fetchSeasons } from '../services/api';
 import { Player } from '../types';
 import { getPlayerImage, getPlayerData } from '../utils/playerImages';
 import { getPlayerColor } from '../utils/playerColors';
@@ -24,15 +24,19 @@ function Competitors() {
   useEffect(() => {
     const loadCompetitors = async () => {
       try {
-        const players = await fetchPlayers();
+        // Career totals span every season; titles add the champions of closed seasons
+        const [players, seasons] = await Promise.all([fetchPlayers({ allTime: true }), fetchSeasons()]);
 
         const enhanced = players.map(player => {
           const playerData = getPlayerData(player.handle);
+          const seasonTitles = seasons.filter(
+            s => s.champion?.toLowerCase() === player.handle.toLowerCase()
+          ).length;
           return {
             ...player,
             imagePath: getPlayerImage(player.handle),
             description: playerData?.description || 'Stroven Super Cup competitor',
-            sscWins: playerData?.sscWins || 0,
+            sscWins: (playerData?.sscWins || 0) + seasonTitles,
             height: playerData?.height || 'N/A',
             nationality: playerData?.nationality || '🌍',
             playingStyle: playerData?.playingStyle || 'Adaptive',
@@ -1,10 +1,19 @@
-import { Player, Match, PlayerDetail } from '../types';
+import { Player, Match, PlayerDetail, Season, SeasonScope } from '../types';
 
-const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
+// The production build is served by the API itself, so it talks to its own origin
+export const API_URL = process.env.REACT_APP_API_URL ??
+  (process.env.NODE_ENV === 'production' ? '' : 'http://localhost:8000');
 
-export const fetchLeaderboard = async (): Promise<Player[]> => {
+// Endpoints cover the current season unless a closed season or all time is requested
+const scopeQuery = (scope: SeasonScope = {}): string => {
+  if (scope.allTime) return '?all_time=1';
+  if (scope.season !== undefined) return `?season=${scope.season}`;
+  return '';
+};
+
+export const fetchLeaderboard = async (scope?: SeasonScope): Promise<Player[]> => {
   try {
-    const response = await fetch(`${API_URL}/api/leaderboard`);
+    const response = await fetch(`${API_URL}/api/leaderboard${scopeQuery(scope)}`);
     const data = await response.json();
     return data.players;
   } catch (error) {
@@ -13,9 +22,9 @@ export const fetchLeaderboard = async (): Promise<Player[]> => {
   }
 };
 
-export const fetchPlayers = async (): Promise<Player[]> => {
+export const fetchPlayers = async (scope?: SeasonScope): Promise<Player[]> => {
   try {
-    const response = await fetch(`${API_URL}/api/players`);
+    const response = await fetch(`${API_URL}/api/players${scopeQuery(scope)}`);
     const data = await response.json();
     return data.players;
   } catch (error) {
@@ -24,9 +33,9 @@ export const fetchPlayers = async (): Promise<Player[]> => {
   }
 };
 
-export const fetchPlayerStats = async (): Promise<any[]> => {
+export const fetchPlayerStats = async (scope?: SeasonScope): Promise<any[]> => {
   try {
-    const response = await fetch(`${API_URL}/api/player-stats`);
+    const response = await fetch(`${API_URL}/api/player-stats${scopeQuery(scope)}`);
     const data = await response.json();
     return data.players;
   } catch (error) {
@@ -35,9 +44,9 @@ export const fetchPlayerStats = async (): Promise<any[]> => {
   }
 };
 
-export const fetchRatingHistory = async (): Promise<any[]> => {
+export const fetchRatingHistory = async (scope?: SeasonScope): Promise<any[]> => {
   try {
-    const response = await fetch(`${API_URL}/api/rating-history`);
+    const response = await fetch(`${API_URL}/api/rating-history${scopeQuery(scope)}`);
     const data = await response.json();
     return data.history;
   } catch (error) {
@@ -46,9 +55,9 @@ export const fetchRatingHistory = async (): Promise<any[]> => {
   }
 };
 
-export const fetchPlayerDetail = async (handle: string): Promise<PlayerDetail | null> => {
+export const fetchPlayerDetail = async (handle: string, scope?: SeasonScope): Promise<PlayerDetail | null> => {
   try {
-    const response = await fetch(`${API_URL}/api/player/${handle}`);
+    const response = await fetch(`${API_URL}/api/player/${handle}${scopeQuery(scope)}`);
     const data = await response.json();
     return {
       ...data.player,
@@ -60,13 +69,24 @@ export const fetchPlayerDetail = async (handle: string): Promise<PlayerDetail |
   }
 };
 
-export const fetchAllMatches = async (): Promise<Match[]> => {
+export const fetchAllMatches = async (scope?: SeasonScope): Promise<Match[]> => {
   try {
-    const response = await fetch(`${API_URL}/api/matches`);
+    const response = await fetch(`${API_URL}/api/matches${scopeQuery(scope)}`);
     const data = await response.json();
     return data.matches;
   } catch (error) {
     console.error('Error fetching matches:', error);
     return [];
   }
+};
+
+export const fetchSeasons = async (): Promise<Season[]> => {
+  try {
+    const response = await fetch(`${API_URL}/api/seasons`);
+    const data = await response.json();
+    return data.seasons;
+  } catch (error) {
+    console.error('Error fetching seasons:', error);
+    return [];
+  }
 };
\ No newline at end of file
@@ -27,6 +27,21 @@ export interface PlayerDetail extends Player {
   recent: Match[];
 }
 
+export interface Season {
+  id: number;
+  name: string;
+  started_at: string;
+  closed_at: string | null;
+  current: boolean;
+  champion: string | null;
+  matches: number;
+}
+
+export interface SeasonScope {
+  season?: number;
+  allTime?: boolean;
+}
+
 export interface Rivalry {
   player1: string;
   player2: string;